@@ -1,10 +1,16 @@
 # launcher/app.py
 # -*- coding: utf-8 -*-
+import mmap
 import os
 import re
-from datetime import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from kivy.lang import Builder
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.utils import platform
 from kivy.properties import ListProperty, BooleanProperty, DictProperty
 from kivy.uix.screenmanager import ScreenManager, Screen
@@ -12,13 +18,83 @@ from kivy.uix.popup import Popup
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from glob import glob
-from os.path import dirname, join, exists
-import traceback
-
-Builder.load_file("launcher/app.kv")
+from os.path import dirname, join
+from stat import S_ISDIR
+from types import SimpleNamespace
+from packman import get_config, save_config
 
 KIVYLAUNCHER_PATHS = os.environ.get("KIVYLAUNCHER_PATHS")
+KIVYLAUNCHER_DEBUG = bool(os.environ.get("KIVYLAUNCHER_DEBUG"))
+
+_NO_TITLE = "- no title -"
+_DEFAULT_LOGO = "data/logo/kivy-icon-64.png"
+_MAIN = "main.py"
+_ICON = "icon.png"
+
+# rows handed to the RecycleView per update during a refresh
+_ROWS_PER_UPDATE = 8
+
+_ANDROID_TXT_DEFAULTS = {"title": _NO_TITLE, "author": "", "orientation": ""}
+
+# key=value lines of android.txt, both sides stripped of blanks
+_ANDROID_TXT_RE = re.compile(
+    rb'^[ \t]*([^#=\s][^=\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.MULTILINE)
+
+# buildozer.spec keys we read; parsing stops once all of them are seen
+_SPEC_KEYS = frozenset(("source.dir", "title", "author", "orientation"))
+_SPEC_KV_RE = re.compile(
+    rb'^[ \t]*(source\.dir|title|author|orientation)[ \t]*=([^\r\n#]*)', re.MULTILINE)
+
+# (second, strftime('%X') of that second), log lines mostly share a second
+_last_timestamp = (None, "")
+
+
+def _log_timestamp():
+    global _last_timestamp
+    t = time.time()
+    sec = int(t)
+    if _last_timestamp[0] != sec:
+        _last_timestamp = (sec, time.strftime('%X', time.localtime(sec)))
+    return f"{_last_timestamp[1]}.{int((t - sec) * 1_000_000):06d}"
+
+
+@lru_cache(maxsize=1)
+def _launcher_main_py():
+    return os.path.realpath(join(dirname(__file__), "..", _MAIN))
+
+
+def _make_row(entry):
+    # RecycleView rows hold only what ProjectItem binds to; the rest of
+    # the entry is shared through data_entry rather than copied
+    return {
+        "data_title": entry.get("title", _NO_TITLE),
+        "data_path": entry.get("path"),
+        "data_logo": entry.get("logo", _DEFAULT_LOGO),
+        "data_author": entry.get("author", ""),
+        "data_entry": entry
+    }
+
+
+# Java classes used by the launcher, resolved through jnius on first use
+_android = None
+
+
+def _get_android():
+    global _android
+    if _android is None:
+        from jnius import autoclass
+        _android = SimpleNamespace(
+            PythonActivity=autoclass("org.kivy.android.PythonActivity"),
+            Intent=autoclass("android.content.Intent"),
+            String=autoclass("java.lang.String"),
+            System=autoclass("java.lang.System"),
+            Environment=autoclass("android.os.Environment"),
+            Settings=autoclass("android.provider.Settings"),
+            Uri=autoclass("android.net.Uri"),
+            PowerManager=autoclass("android.os.PowerManager"),
+            Context=autoclass("android.content.Context"),
+        )
+    return _android
 
 
 class ProjectListScreen(Screen):
@@ -27,107 +103,247 @@ class ProjectListScreen(Screen):
     display_logs = BooleanProperty(False)
 
     def log(self, log):
-        print(log)
-        self.logs.append(f"{datetime.now().strftime('%X.%f')}: {log}")
+        if KIVYLAUNCHER_DEBUG:
+            print(log)
+        if not self.display_logs:
+            return
+        # buffered, flushed into self.logs at most once per frame
+        self._log_buf.append(f"{_log_timestamp()}: {log}")
+        self._trigger_flush_logs()
+
+    def _flush_logs(self, *args):
+        # drain rather than swap: workers may still be appending, and
+        # deque.append/popleft are atomic, so no line is dropped
+        buf = self._log_buf
+        lines = []
+        while buf:
+            lines.append(buf.popleft())
+        if lines:
+            self.logs = self.logs + lines
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # path -> (st_mtime_ns, [entry, ...])
+        self._scan_cache = {}
+        # path -> {project file: (stat key, entry)}, survives forced refreshes
+        self._entry_cache = {}
+        self._refresh_id = 0
+        self._log_buf = deque()
+        self._trigger_flush_logs = Clock.create_trigger(self._flush_logs)
 
     def on_pre_enter(self):
-        self.refresh_entries()
+        # coming back from another screen: rescan only if a root changed
+        if not self.scan_is_current():
+            self.refresh_entries()
+
+    def scan_is_current(self):
+        for path in self.paths:
+            cached = self._scan_cache.get(path)
+            if cached is None:
+                return False
+            try:
+                if os.stat(path).st_mtime_ns != cached[0]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def refresh_entries(self, force=False):
+        # scan off the UI thread; only the latest refresh may publish rows
+        self._refresh_id += 1
+        if force:
+            self._scan_cache.clear()
+        threading.Thread(
+            target=self._do_refresh, args=(self._refresh_id, list(self.paths)),
+            daemon=True).start()
 
-    def refresh_entries(self):
-        data = []
+    def _do_refresh(self, refresh_id, paths):
         self.log('starting refresh')
-        for entry in self.find_entries(paths=self.paths):
-            self.log(f'found entry {entry}')
-            data.append({
-                "data_title": entry.get("title", "- no title -"),
-                "data_path": entry.get("path"),
-                "data_logo": entry.get("logo", "data/logo/kivy-icon-64.png"),
-                "data_orientation": entry.get("orientation", ""),
-                "data_author": entry.get("author", ""),
-                "data_entry": entry
-            })
-        self.ids.rv.data = data
+        Clock.schedule_once(partial(self._set_data, refresh_id, []))
+        # hand rows over in chunks: each rv.data update redraws the list
+        chunk = []
+        for entry in self.scan_roots(paths):
+            if self.display_logs:
+                self.log(f'found entry {entry}')
+            chunk.append(_make_row(entry))
+            if len(chunk) >= _ROWS_PER_UPDATE:
+                Clock.schedule_once(partial(self._extend_data, refresh_id, chunk))
+                chunk = []
+        if chunk:
+            Clock.schedule_once(partial(self._extend_data, refresh_id, chunk))
+
+    def _set_data(self, refresh_id, data, *args):
+        if refresh_id == self._refresh_id:
+            self.ids.rv.data = data
+
+    def _extend_data(self, refresh_id, rows, *args):
+        if refresh_id == self._refresh_id:
+            self.ids.rv.data.extend(rows)
+
+    def scan_roots(self, paths):
+        # roots are I/O bound (sdcard, network mounts), scan them concurrently
+        if len(paths) < 2:
+            yield from self.find_entries(paths=paths)
+            return
+        with ThreadPoolExecutor(max_workers=min(8, len(paths))) as ex:
+            # rows of the first root reach the list while later ones still scan
+            for entries in ex.map(self.scan_one_root, paths):
+                yield from entries
+
+    def scan_one_root(self, path):
+        return list(self.find_entries(path=path))
 
     def find_entries(self, path=None, paths=None):
         if paths is not None:
             for p in paths:
                 yield from self.find_entries(path=p)
             return
-        if path is None or not exists(path):
+        if path is None:
             return
-        for filename in glob(join(path, "*/android.txt")):
-            entry = self.read_android_txt(filename)
-            if entry:
-                yield entry
-        for filename in glob(join(path, "*/buildozer.spec")):
-            entry = self.read_buildozer_spec(filename)
-            if entry:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if not S_ISDIR(st.st_mode):
+            return
+        mtime = st.st_mtime_ns
+        cached = self._scan_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            yield from cached[1]
+            return
+        entries = []
+        try:
+            for entry in self.scan_entries(path):
+                entries.append(entry)
                 yield entry
+        except OSError:
+            # unreadable root (e.g. storage permission not granted yet):
+            # leave it uncached so the next refresh scans it again
+            return
+        self._scan_cache[path] = (mtime, entries)
+        if self.display_logs:
+            self.log(f"scanned {path}: {len(entries)} entries")
+
+    def iter_project_dirs(self, path):
+        try:
+            with os.scandir(path) as it:
+                for de in it:
+                    if de.is_dir():
+                        yield de
+        except OSError as e:
+            self.log(f"Error scanning {path}: {e}")
+            raise
+
+    def scan_entries(self, path):
+        # project file -> ((st_mtime_ns, st_size, dir st_mtime_ns), entry),
+        # rebuilt on every scan so removed projects drop out
+        old = self._entry_cache.get(path, {})
+        new = {}
+        for de in self.iter_project_dirs(path):
+            sub = de.path
+            try:
+                dir_mtime = de.stat().st_mtime_ns
+            except OSError:
+                continue
+            files = self.list_files(sub)
+            for name, reader in (("android.txt", self.read_android_txt),
+                                 ("buildozer.spec", self.read_buildozer_spec)):
+                if name not in files:
+                    continue
+                filename = sub + os.sep + name
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue
+                key = (st.st_mtime_ns, st.st_size, dir_mtime)
+                cached = old.get(filename)
+                if cached is not None and cached[0] == key and (
+                        reader is self.read_android_txt
+                        or (cached[1] and cached[1]["path"] == sub)):
+                    # a spec whose source.dir points elsewhere depends on a
+                    # directory the key doesn't cover, so only reuse in-place ones
+                    entry = cached[1]
+                else:
+                    entry = reader(filename, files, base_dir=sub)
+                new[filename] = (key, entry)
+                if entry:
+                    yield entry
+        self._entry_cache[path] = new
 
-    def read_android_txt(self, filename):
-        data = {}
+    @staticmethod
+    def list_files(path):
+        # one scandir per project dir answers every later "does X exist" probe
         try:
-            with open(filename, "r", encoding='utf-8') as fd:
-                for line in fd:
-                    line = line.strip()
-                    if not line or '=' not in line:
-                        continue
-                    k, v = line.split("=", 1)
-                    data[k.strip()] = v.strip()
+            with os.scandir(path) as it:
+                return {de.name for de in it if de.is_file()}
+        except OSError:
+            return set()
+
+    def read_android_txt(self, filename, files=None, base_dir=None):
+        try:
+            with open(filename, "rb") as fd:
+                content = fd.read()
+            data = {m.group(1).decode('utf-8', 'replace'):
+                    m.group(2).decode('utf-8', 'replace')
+                    for m in _ANDROID_TXT_RE.finditer(content)}
         except Exception as e:
             self.log(f"Error reading android.txt {filename}: {e}")
-            traceback.print_exc()
+            if self.display_logs:
+                import traceback
+                traceback.print_exc()
             return None
-        base_dir = dirname(filename)
-        data["entrypoint"] = join(base_dir, "main.py")
-        data["path"] = base_dir
-        data.setdefault("title", "- no title -")
-        data.setdefault("author", "")
-        data.setdefault("orientation", "")
-        icon = join(base_dir, "icon.png")
-        data["logo"] = icon if exists(icon) else "data/logo/kivy-icon-64.png"
-        return data
+        if base_dir is None:
+            base_dir = dirname(filename)
+        if files is None:
+            files = self.list_files(base_dir)
+        return {
+            **_ANDROID_TXT_DEFAULTS,
+            **data,
+            "entrypoint": base_dir + os.sep + _MAIN,
+            "path": base_dir,
+            "logo": base_dir + os.sep + _ICON if _ICON in files else _DEFAULT_LOGO,
+        }
 
-    def read_buildozer_spec(self, filename):
+    def read_buildozer_spec(self, filename, files=None, base_dir=None):
+        kv = {}
         try:
-            with open(filename, "r", encoding='utf-8') as fd:
-                content = fd.read()
+            with open(filename, "rb") as fd:
+                if os.fstat(fd.fileno()).st_size:
+                    with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        for m in _SPEC_KV_RE.finditer(mm):
+                            key = m.group(1).decode('ascii')
+                            if key not in kv:
+                                kv[key] = m.group(2).strip().decode('utf-8')
+                                if len(kv) == len(_SPEC_KEYS):
+                                    break
         except Exception as e:
             self.log(f"Error reading buildozer.spec {filename}: {e}")
-            traceback.print_exc()
+            if self.display_logs:
+                import traceback
+                traceback.print_exc()
             return None
-        match = re.search(r'^\s*source\.dir\s*=\s*(.+)$', content, re.MULTILINE)
-        if not match:
-            return None
-        source_dir = match.group(1).strip()
-        if '#' in source_dir:
-            source_dir = source_dir.split('#', 1)[0].strip()
+        source_dir = kv.get("source.dir")
         if not source_dir:
             return None
-        spec_dir = dirname(filename)
-        main_dir = os.path.normpath(join(spec_dir, source_dir))
-        main_py = join(main_dir, "main.py")
-        if not exists(main_py):
+        spec_dir = dirname(filename) if base_dir is None else base_dir
+        if source_dir in (".", "./"):
+            main_dir = spec_dir
+        else:
+            main_dir = os.path.normpath(join(spec_dir, source_dir))
+        if files is None or main_dir != spec_dir:
+            files = self.list_files(main_dir)
+        if _MAIN not in files:
             return None
-
-        def get_spec_value(key):
-            m = re.search(rf'^\s*{key}\s*=\s*(.+)$', content, re.MULTILINE)
-            if m:
-                val = m.group(1).strip()
-                if '#' in val:
-                    val = val.split('#', 1)[0].strip()
-                return val
-            return ""
+        main_py = main_dir + os.sep + _MAIN
 
         data = {
-            "title": get_spec_value("title") or "- no title -",
-            "author": get_spec_value("author"),
-            "orientation": get_spec_value("orientation"),
+            "title": kv.get("title") or _NO_TITLE,
+            "author": kv.get("author", ""),
+            "orientation": kv.get("orientation", ""),
             "entrypoint": main_py,
             "path": main_dir
         }
-        icon = join(main_dir, "icon.png")
-        data["logo"] = icon if exists(icon) else "data/logo/kivy-icon-64.png"
+        data["logo"] = main_dir + os.sep + _ICON if _ICON in files else _DEFAULT_LOGO
         return data
 
     def start_activity(self, entry):
@@ -138,20 +354,24 @@ class ProjectListScreen(Screen):
 
     def start_desktop_activity(self, entry):
         import sys
-        from subprocess import Popen
         env = os.environ.copy()
         env["KIVYLAUNCHER_ENTRYPOINT"] = entry["entrypoint"]
-        main_py = os.path.realpath(os.path.join(
-            os.path.dirname(__file__), "..", "main.py"))
-        Popen([sys.executable, main_py], env=env)
+        main_py = _launcher_main_py()
+        # like System.exit() on android: the project replaces the launcher
+        app = App.get_running_app()
+        if app is not None:
+            app.stop()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execve(sys.executable, [sys.executable, main_py], env)
 
     def start_android_activity(self, entry):
-        from jnius import autoclass
-        PythonActivity = autoclass("org.kivy.android.PythonActivity")
-        System = autoclass("java.lang.System")
+        android = _get_android()
+        PythonActivity = android.PythonActivity
+        System = android.System
         activity = PythonActivity.mActivity
-        Intent = autoclass("android.content.Intent")
-        String = autoclass("java.lang.String")
+        Intent = android.Intent
+        String = android.String
         intent = Intent(activity.getApplicationContext(), PythonActivity)
         intent.putExtra("entrypoint", String(entry["entrypoint"]))
         intent.putExtra("orientation", String(entry.get("orientation", "")))
@@ -163,11 +383,9 @@ class ConfigEditorScreen(Screen):
     config = DictProperty({})
 
     def on_pre_enter(self):
-        from packman import get_config
         self.config = get_config()
 
     def save_config(self):
-        from packman import save_config
         try:
             termux_repo = self.ids.termux_repo.text
             pypi_index = self.ids.pypi_index.text
@@ -186,11 +404,12 @@ class ConfigEditorScreen(Screen):
 
 class LauncherApp(App):
     def build(self):
+        # loaded here rather than at import, and independent of the cwd
+        Builder.load_file(join(dirname(__file__), "app.kv"))
         if KIVYLAUNCHER_PATHS:
             paths = KIVYLAUNCHER_PATHS.split(",")
         elif platform == 'android':
-            from jnius import autoclass
-            Environment = autoclass('android.os.Environment')
+            Environment = _get_android().Environment
             sdcard = Environment.getExternalStorageDirectory().getAbsolutePath()
             paths = [f"{sdcard}/Download/kivy"]
         else:
@@ -218,17 +437,17 @@ class LauncherApp(App):
         return self.root
 
     def check_all_files_access(self):
-        from jnius import autoclass
-        PythonActivity = autoclass('org.kivy.android.PythonActivity')
-        Environment = autoclass('android.os.Environment')
+        android = _get_android()
+        PythonActivity = android.PythonActivity
+        Environment = android.Environment
         if Environment.isExternalStorageManager():
             self.request_battery_optimization()
         else:
             # 直接跳转 —— 在 targetSdk=28/29 下会弹窗（Android 11–13）
             # Android 14 会跳设置，但权限仍可手动开启
-            Settings = autoclass('android.provider.Settings')
-            Intent = autoclass('android.content.Intent')
-            Uri = autoclass('android.net.Uri')
+            Settings = android.Settings
+            Intent = android.Intent
+            Uri = android.Uri
             intent = Intent(Settings.ACTION_MANAGE_APP_ALL_FILES_ACCESS_PERMISSION)
             uri = Uri.parse(f"package:{PythonActivity.mActivity.getPackageName()}")
             intent.setData(uri)
@@ -239,10 +458,11 @@ class LauncherApp(App):
             )
 
     def is_battery_optimization_ignored(self):
-        from jnius import autoclass, cast
-        PythonActivity = autoclass("org.kivy.android.PythonActivity")
-        Context = autoclass("android.content.Context")
-        PowerManager = autoclass("android.os.PowerManager")
+        from jnius import cast
+        android = _get_android()
+        PythonActivity = android.PythonActivity
+        Context = android.Context
+        PowerManager = android.PowerManager
         context = PythonActivity.mActivity.getApplicationContext()
         power_manager = cast(PowerManager, context.getSystemService(Context.POWER_SERVICE))
         if power_manager:
@@ -251,11 +471,11 @@ class LauncherApp(App):
         return False
 
     def show_battery_optimization_popup(self):
-        from jnius import autoclass
-        PythonActivity = autoclass("org.kivy.android.PythonActivity")
-        Intent = autoclass("android.content.Intent")
-        Settings = autoclass("android.provider.Settings")
-        Uri = autoclass("android.net.Uri")
+        android = _get_android()
+        PythonActivity = android.PythonActivity
+        Intent = android.Intent
+        Settings = android.Settings
+        Uri = android.Uri
         intent = Intent(Settings.ACTION_REQUEST_IGNORE_BATTERY_OPTIMIZATIONS)
         package_uri = Uri.fromParts("package", PythonActivity.mActivity.getPackageName(), None)
         intent.setData(package_uri)
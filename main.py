@@ -1,11 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import json
-import hashlib
-import datetime
-import fcntl
-from pathlib import Path
+import runpy
 
 # === Step 1: Autoclass Hook for Service Redirection ===
 import jnius
@@ -31,51 +27,42 @@ SERVICE_SLOTS = [
 ]
 
 
-# 获取应用私有目录（复用 packman）
-def _get_app_files_dir():
-    from packman import _get_app_files_dir as get_dir
-
-    return get_dir()
-
-
-SERVICE_JSON = Path(_get_app_files_dir()) / "service.json"
-
-
 def allocate_service_slot(entrypoint: str) -> str:
-    """为项目分配一个服务槽位，并更新 service.json（带文件锁）"""
-    project_id = hashlib.md5(entrypoint.encode()).hexdigest()[:8]
-    slot_index = int(project_id, 16) % 10
+    """为项目分配一个服务槽位，并追加记录到 service.log（带文件锁）"""
+    import datetime
+    import zlib
+
+    crc = zlib.crc32(entrypoint.encode())
+    project_id = f"{crc:08x}"
+    slot_index = crc % 10
     service_class = SERVICE_SLOTS[slot_index]
 
-    # 确保目录存在
-    SERVICE_JSON.parent.mkdir(parents=True, exist_ok=True)
-
-    # 加锁写入
-    with open(SERVICE_JSON, "a+") as f:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-        f.seek(0)
-        try:
-            data = json.load(f)
-        except:
-            data = {}
-        data[project_id] = {
-            "entrypoint": entrypoint,
-            "slot": slot_index,
-            "assigned_at": str(datetime.datetime.now()),
-        }
-        f.truncate(0)
-        json.dump(data, f, indent=2)
-        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    # 同步写入：服务进程启动时就要按槽位读取这条记录
+    record_service_assignment(project_id, {
+        "entrypoint": entrypoint,
+        "slot": slot_index,
+        "assigned_at": str(datetime.datetime.now()),
+    })
 
     print(f"[SERVICE] Project {project_id} → Slot{slot_index}")
     return service_class
 
 
+# 系统类前缀，这些类即使名字里带 Service 也不重定向
+_SYSTEM_PREFIXES = ("android.", "java.", "javax.")
+# classname -> 是否需要重定向（每个类名只判断一次）
+_service_decisions = {}
+
+
 def hooked_autoclass(classname):
     """劫持 autoclass，重定向服务类到预注册槽位"""
-    if "Service" in classname and not classname.startswith(
-        ("android.", "java.", "javax.")
-    ):
+    redirect = _service_decisions.get(classname)
+    if redirect is None:
+        redirect = "Service" in classname and not classname.startswith(
+            _SYSTEM_PREFIXES
+        )
+        _service_decisions[classname] = redirect
+    if redirect:
         # 获取当前 entrypoint（优先环境变量，其次 Intent）
         entrypoint = os.environ.get("KIVYLAUNCHER_ENTRYPOINT")
         if not entrypoint:
@@ -102,18 +89,16 @@ def hooked_autoclass(classname):
 
 
 # 注入 hook（必须在导入其他模块前！）
-jnius.autoclass = hooked_autoclass
+# 设置 KIVYLAUNCHER_DISABLE_SERVICE_HOOK 可关闭服务重定向
+if not os.environ.get("KIVYLAUNCHER_DISABLE_SERVICE_HOOK"):
+    jnius.autoclass = hooked_autoclass
+
+from packman import ensure_project_site_packages, record_service_assignment
 
 
 # === Step 2: Entry Point Logic ===
 def run_entrypoint(entrypoint):
-    import runpy
-    import sys
-    import os
-
     # 注入项目 site-packages（由 packman 管理）
-    from packman import ensure_project_site_packages
-
     ensure_project_site_packages()
     entrypoint_path = os.path.dirname(entrypoint)
     sys.path.insert(0, os.path.realpath(entrypoint_path))
@@ -127,8 +112,6 @@ def run_launcher(tb=None):
 
 
 def dispatch():
-    import os
-
     print("dispatch!")
     entrypoint = os.environ.get("KIVYLAUNCHER_ENTRYPOINT")
     if entrypoint is not None:
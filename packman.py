@@ -7,29 +7,52 @@ Features:
 - Config stored in internal storage: /data/data/<package>/files/config.json
 - Smart source selection: try Termux first, fallback to PyPI
 - Explicit source control via `source` parameter
+- Batch installs with parallel downloads via `install_many`
 
 Author: User
 """
 
 import os
 import sys
+import platform
 import json
 import re
-import urllib.request
-import tarfile
-import zipfile
-import shutil
+import operator as _op
+import time
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice, zip_longest
 from pathlib import Path
-from typing import Optional, Dict, Tuple, Literal
-from urllib.parse import urljoin, quote
+from typing import Optional, Dict, List, Tuple, Literal
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # === 类型定义 ===
 Source = Literal["termux", "pypi", "auto"]
 
+
+# === JSON 编解码（有 orjson 时使用 orjson） ===
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
 import os
 import sys
 from pathlib import Path
 
+@lru_cache(maxsize=1)
 def _get_app_package_name() -> str:
     """
     通过 Android Java API 获取当前应用的包名。
@@ -73,6 +96,7 @@ def _get_app_package_name() -> str:
         raise RuntimeError(f"Cannot determine Android package name: {e}")
 
 
+@lru_cache(maxsize=1)
 def _get_app_files_dir() -> str:
     """
     获取 Kivy Launcher 的私有 files 目录。
@@ -96,15 +120,27 @@ def _get_app_files_dir() -> str:
                 return fallback
         raise RuntimeError(f"Cannot determine app private directory: {e}")
 
+
+@lru_cache(maxsize=1)
+def _cache_dir() -> Path:
+    """全局包缓存目录（files/cache）。"""
+    return Path(_get_app_files_dir()) / "cache"
+
+# (config.json 的 st_mtime_ns, 解析后的配置)，文件未变时不再重复解析
+_config_cache: Optional[Tuple[int, Dict]] = None
+
+
 def _load_config() -> Dict:
     """
     从内部存储加载配置文件 config.json。
     
     配置文件路径: /data/data/<package>/files/config.json
+    文件未修改时直接返回缓存的配置（只需一次 stat）。
     
     Returns:
         dict: 配置字典，包含默认值
     """
+    global _config_cache
     default_config = {
         "termux_repo": "https://packages.termux.dev/apt/termux-main",
         "pypi_index_url": "https://pypi.org/simple",
@@ -112,16 +148,22 @@ def _load_config() -> Dict:
     }
     
     config_path = Path(_get_app_files_dir()) / "config.json"
-    if config_path.exists():
-        try:
-            with open(config_path, 'r') as f:
-                user_config = json.load(f)
-            # 合并默认配置
-            config = default_config.copy()
-            config.update(user_config)
-            return config
-        except Exception as e:
-            print(f"⚠️  Warning: Failed to load config.json: {e}")
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except OSError:
+        return default_config
+    if _config_cache is not None and _config_cache[0] == mtime:
+        return _config_cache[1].copy()
+    try:
+        with open(config_path, 'rb') as f:
+            user_config = _json_loads(f.read())
+        # 合并默认配置
+        config = default_config.copy()
+        config.update(user_config)
+        _config_cache = (mtime, config)
+        return config.copy()
+    except (OSError, ValueError, TypeError) as e:
+        print(f"⚠️  Warning: Failed to load config.json: {e}")
     
     return default_config
 
@@ -130,15 +172,176 @@ def _save_config(config: Dict) -> None:
     """
     保存配置到内部存储（供外部配置编辑器使用）。
     
+    先写临时文件再 os.replace，读取方不会看到写了一半的文件。
+    
     Args:
         config (dict): 要保存的配置
     """
+    global _config_cache
     config_path = Path(_get_app_files_dir()) / "config.json"
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=2)
+    tmp_path = config_path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(_json_dumps(config, indent=True))
+    os.replace(tmp_path, config_path)
+    _config_cache = None
+
+
+# === 服务槽位记录 ===
+# service.json 是压缩后的快照，service.log 按行追加之后的分配记录
+_SERVICE_LOG_COMPACT_SIZE = 64 * 1024
+
+# (两个文件的 stat 键, 解析后的分配表, 槽位 -> 分配信息)，文件未变时不再重复解析
+_service_cache: Optional[Tuple[tuple, Dict, Dict]] = None
+
+
+def _service_files() -> Tuple[Path, Path]:
+    files_dir = Path(_get_app_files_dir())
+    return files_dir / "service.json", files_dir / "service.log"
+
+
+def _read_service_assignments(snapshot: Path, log_file) -> Dict:
+    """读取快照并重放已打开（且已加锁）的追加日志。"""
+    data = {}
+    try:
+        with open(snapshot, 'rb') as f:
+            data = _json_loads(f.read())
+    except (OSError, ValueError):
+        pass
+    if log_file is None:
+        return data
+    log_file.seek(0)
+    for line in log_file:
+        try:
+            record = _json_loads(line)
+        except ValueError:
+            continue  # 写到一半的行
+        project_id = record.pop("project_id", None)
+        if project_id:
+            # 先删再插，保证字典顺序就是最后写入的先后顺序
+            data.pop(project_id, None)
+            data[project_id] = record
+    return data
+
+
+def _service_files_key(snapshot: Path, log: Path) -> tuple:
+    """两个文件的 (st_ino, st_mtime_ns, st_size)，不存在时为 None；用作缓存键。"""
+    key = []
+    for path in (snapshot, log):
+        try:
+            st = os.stat(path)
+        except OSError:
+            key.append(None)
+        else:
+            key.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+
+def _load_service_cache() -> Tuple[Dict, Dict]:
+    """
+    读取（或从缓存取出）分配表及其按槽位的索引。
+    
+    service.json 和 service.log 都未变化时直接返回缓存的结果（只需两次 stat）。
+    """
+    global _service_cache
+    import fcntl
+    snapshot, log = _service_files()
+    key = _service_files_key(snapshot, log)
+    if _service_cache is not None and _service_cache[0] == key:
+        return _service_cache[1], _service_cache[2]
+    
+    if key[1] is None:
+        data = _read_service_assignments(snapshot, None)
+    else:
+        with open(log, 'rb') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            try:
+                data = _read_service_assignments(snapshot, f)
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    # 同一槽位有多条记录时以最后写入的为准（旧记录，如换哈希前的，不会遮住新记录）
+    by_slot = {}
+    for info in data.values():
+        if "slot" in info:
+            by_slot[info["slot"]] = info
+    _service_cache = (key, data, by_slot)
+    return data, by_slot
+
+
+def load_service_assignments() -> Dict:
+    """
+    读取服务槽位分配表。
+    
+    Returns:
+        dict: project_id -> {"entrypoint", "slot", "assigned_at"}
+    """
+    return _load_service_cache()[0].copy()
+
+
+def get_service_assignment(slot: int) -> Optional[Dict]:
+    """
+    查找分配到指定服务槽位的项目。
+    
+    Args:
+        slot (int): 服务槽位编号
+    
+    Returns:
+        dict: 分配信息（entrypoint, slot, assigned_at），没有时为 None
+    """
+    info = _load_service_cache()[1].get(slot)
+    return dict(info) if info is not None else None
+
+
+def record_service_assignment(project_id: str, info: Dict) -> None:
+    """
+    追加一条服务槽位分配记录。
+    
+    每次只追加一行（O(1)），日志超过 64 KiB 时压缩回 service.json。
+    
+    Args:
+        project_id (str): 项目 ID
+        info (dict): 分配信息（entrypoint, slot, assigned_at）
+    """
+    import fcntl
+    snapshot, log = _service_files()
+    log.parent.mkdir(parents=True, exist_ok=True)
+    line = _json_dumps({"project_id": project_id, **info}) + b"\n"
+    with open(log, 'ab+') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.write(line)
+            f.flush()
+            if f.tell() >= _SERVICE_LOG_COMPACT_SIZE:
+                data = _read_service_assignments(snapshot, f)
+                tmp = snapshot.with_suffix(".tmp")
+                with open(tmp, 'wb') as out:
+                    out.write(_json_dumps(data, indent=True))
+                os.replace(tmp, snapshot)
+                f.truncate(0)
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 
 # === 工具函数 ===
+# 预编译的正则（需求解析、版本规范化）
+_REQ_NAME_RE = re.compile(r'^([a-zA-Z0-9_-]+)')
+_REQ_OP_RE = re.compile(r'^([<>=!]=?|~=)')
+_VER_STRIP_RE = re.compile(r'[^0-9.]+.*')
+_DIST_NAME_RE = re.compile(r'[-_.]+')
+# 正式发布版本（不含 a/b/rc/dev 等预发布标识，允许 .postN）
+_RELEASE_VER_RE = re.compile(r'^\d+(?:\.\d+)*(?:\.?post\d+)?$')
+
+# 版本比较操作符，作用于三路比较结果与 0（~= 单独处理）
+_OPS = {
+    '==': _op.eq,
+    '!=': _op.ne,
+    '>=': _op.ge,
+    '<=': _op.le,
+    '>': _op.gt,
+    '<': _op.lt,
+}
+
+
+@lru_cache(maxsize=512)
 def _parse_requirement(req: str) -> Tuple[str, str, str]:
     """
     解析包需求字符串。
@@ -154,7 +357,7 @@ def _parse_requirement(req: str) -> Tuple[str, str, str]:
     """
     req = req.strip()
     # 匹配包名（允许字母、数字、连字符、下划线）
-    match = re.match(r'^([a-zA-Z0-9_-]+)', req)
+    match = _REQ_NAME_RE.match(req)
     if not match:
         raise ValueError(f"Invalid package name in requirement: {req}")
     
@@ -165,7 +368,7 @@ def _parse_requirement(req: str) -> Tuple[str, str, str]:
         return package_name, "", ""
     
     # 匹配操作符和版本
-    op_match = re.match(r'^([<>=!]=?|~=)', remaining)
+    op_match = _REQ_OP_RE.match(remaining)
     if op_match:
         operator = op_match.group(1)
         version = remaining[len(operator):].strip()
@@ -176,6 +379,42 @@ def _parse_requirement(req: str) -> Tuple[str, str, str]:
     raise ValueError(f"Invalid requirement format: {req}")
 
 
+@lru_cache(maxsize=1024)
+def _normalize_version(v: str) -> Tuple[int, ...]:
+    """将版本字符串转换为可比较的元组（移除预发布标识等）"""
+    v = _VER_STRIP_RE.sub('', v)
+    return tuple(int(p) if p.isdigit() else 0 for p in v.split('.'))
+
+
+@lru_cache(maxsize=1024)
+def _pack_version(v: str) -> Optional[int]:
+    """
+    把版本打包成一个 64 位整数（每段 16 位，主版本号在最高位，不足 4 段按 0 补齐），
+    打包值的大小关系与版本元组一致。
+    
+    Returns:
+        int: 打包后的版本；超过 4 段或某段大于 0xFFFF 时为 None
+    """
+    parts = _normalize_version(v)
+    if len(parts) > 4:
+        return None
+    packed = 0
+    for part in parts:
+        if part > 0xFFFF:
+            return None
+        packed = (packed << 16) | part
+    return packed << (16 * (4 - len(parts)))
+
+
+def _compare_versions(a: Tuple[int, ...], b: Tuple[int, ...]) -> int:
+    """三路比较两个版本元组（较短的一方按 0 补齐），返回 -1、0 或 1。"""
+    for x, y in zip_longest(a, b, fillvalue=0):
+        if x != y:
+            return -1 if x < y else 1
+    return 0
+
+
+@lru_cache(maxsize=1024)
 def _version_satisfies(installed: str, operator: str, required: str) -> bool:
     """
     检查已安装版本是否满足版本约束。
@@ -191,141 +430,340 @@ def _version_satisfies(installed: str, operator: str, required: str) -> bool:
     if not operator:
         return True
     
-    def normalize_version(v: str) -> list:
-        """将版本字符串转换为可比较的列表"""
-        # 移除预发布标识等
-        v = re.sub(r'[^0-9.]+.*', '', v)
-        parts = v.split('.')
-        return [int(p) if p.isdigit() else 0 for p in parts]
-    
     try:
-        inst_parts = normalize_version(installed)
-        req_parts = normalize_version(required)
+        compare = _OPS.get(operator)
+        if compare is not None:
+            # 常见情况：两边都能打包成整数时只需一次整数比较
+            inst_packed = _pack_version(installed)
+            req_packed = _pack_version(required)
+            if inst_packed is not None and req_packed is not None:
+                return compare(inst_packed, req_packed)
         
-        # 补齐较短的版本列表
-        max_len = max(len(inst_parts), len(req_parts))
-        inst_parts.extend([0] * (max_len - len(inst_parts)))
-        req_parts.extend([0] * (max_len - len(req_parts)))
+        inst_parts = _normalize_version(installed)
+        req_parts = _normalize_version(required)
+        cmp = _compare_versions(inst_parts, req_parts)
         
-        if operator == '==':
-            return inst_parts == req_parts
-        elif operator == '>=':
-            return inst_parts >= req_parts
-        elif operator == '<=':
-            return inst_parts <= req_parts
-        elif operator == '>':
-            return inst_parts > req_parts
-        elif operator == '<':
-            return inst_parts < req_parts
-        elif operator == '!=':
-            return inst_parts != req_parts
-        elif operator == '~=':  # 兼容版本
-            if len(req_parts) >= 2:
+        if operator == '~=':  # 兼容版本
+            length = max(len(inst_parts), len(req_parts))
+            if length >= 2:
                 # ~=1.4.5 等价于 >=1.4.5, ==1.4.*
-                base = req_parts[:-1]
-                inst_base = inst_parts[:len(base)]
-                return inst_base == base and inst_parts >= req_parts
-            return inst_parts >= req_parts
+                pairs = islice(zip_longest(inst_parts, req_parts, fillvalue=0), length - 1)
+                return cmp >= 0 and all(a == b for a, b in pairs)
+            return cmp >= 0
+        
+        compare = _OPS.get(operator)
+        if compare is not None:
+            return compare(cmp, 0)
     except Exception:
         pass
     
     return False
 
 
+def _is_safe_relative_path(path: str) -> bool:
+    """归档成员路径是否为非空、且不会跳出目标目录的相对路径。"""
+    parts = path.split('/')
+    return bool(path) and not path.startswith('/') and '..' not in parts
+
+
+class _LimitedReader:
+    """只读包装：最多从底层文件读取 n 字节（用于流式读取 ar 归档成员）。"""
+    
+    def __init__(self, fileobj, n: int):
+        self._fileobj = fileobj
+        self._left = n
+    
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._fileobj.read(size)
+        self._left -= len(data)
+        return data
+
+
+@lru_cache(maxsize=1)
 def _get_project_name() -> str:
     """获取当前项目名称（基于 main.py 所在目录名）"""
     main_path = os.path.abspath(sys.argv[0])
     return os.path.basename(os.path.dirname(main_path))
 
 
+# === HTTP 连接复用 ===
+# 有 urllib3 时（APK 已打包）用其连接池复用连接，否则回退为 urllib 逐次请求
+_HTTP_HEADERS = {'User-Agent': 'packman/1.0'}
+_HTTP_MAX_REDIRECTS = 5
+
+# 代理地址（不走代理时为 None）-> urllib3 PoolManager / ProxyManager
+_http_pools: Dict[Optional[str], object] = {}
+_http_pools_lock = threading.Lock()
+
+
+class _HTTPStatusError(OSError):
+    """服务器返回了非 200 状态码（status 属性为状态码）。"""
+    
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+
+
+@lru_cache(maxsize=1)
+def _load_urllib3():
+    """urllib3 模块；不可用时为 None。"""
+    try:
+        import urllib3
+    except ImportError:
+        return None
+    return urllib3
+
+
+def _http_pool_for(url: str):
+    """
+    取访问 url 所用的 urllib3 连接池。
+    
+    按 urllib.request.getproxies() 的代理设置（含 no_proxy）选择 ProxyManager；
+    没有 urllib3 时返回 None。
+    """
+    urllib3 = _load_urllib3()
+    if urllib3 is None:
+        return None
+    import urllib.request
+    parts = urlsplit(url)
+    proxy = urllib.request.getproxies().get(parts.scheme)
+    if proxy and urllib.request.proxy_bypass(parts.hostname or ''):
+        proxy = None
+    with _http_pools_lock:
+        pool = _http_pools.get(proxy)
+        if pool is None:
+            retries = urllib3.Retry(total=None, connect=3, read=2, redirect=_HTTP_MAX_REDIRECTS)
+            options = dict(maxsize=_INSTALL_WORKERS, retries=retries, headers=_HTTP_HEADERS)
+            if proxy:
+                pool = urllib3.ProxyManager(proxy, **options)
+            else:
+                pool = urllib3.PoolManager(**options)
+            _http_pools[proxy] = pool
+    return pool
+
+
+@contextmanager
+def _http_open(url: str, method: str = 'GET', timeout: float = 15):
+    """
+    发送请求并返回响应（自动跟随重定向，遵循环境变量中的代理设置）。
+    
+    有 urllib3 时通过共享连接池复用连接（同一主机只做一次 TLS 握手）。
+    
+    Args:
+        url (str): 请求地址
+        method (str): 请求方法
+        timeout (float): 超时（秒）
+    
+    Yields:
+        状态码为 200 的响应（支持 read(n)）
+    
+    Raises:
+        OSError: 网络错误；状态码不是 200 时为 _HTTPStatusError
+    """
+    pool = _http_pool_for(url)
+    if pool is None:
+        import urllib.error
+        import urllib.request
+        request = urllib.request.Request(url, method=method, headers=_HTTP_HEADERS)
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            e.close()
+            raise _HTTPStatusError(e.code, url) from None
+        with response:
+            yield response
+        return
+    
+    from urllib3.exceptions import HTTPError
+    try:
+        response = pool.request(method, url, timeout=timeout, preload_content=False)
+    except HTTPError as e:
+        raise OSError(f"Request failed for {url}: {e}") from e
+    try:
+        if response.status != 200:
+            response.drain_conn()
+            raise _HTTPStatusError(response.status, url)
+        yield response
+    except HTTPError as e:
+        # 读取过程中的 urllib3 异常不是 OSError，统一转换
+        raise OSError(f"Request failed for {url}: {e}") from e
+    finally:
+        response.release_conn()
+
+
+def _http_download(url: str, path: Path, timeout: float = 60, sha256: Optional[str] = None) -> None:
+    """
+    通过复用连接把 url 流式下载到 path。
+    
+    给出 sha256 时边下载边计算摘要（单次遍历），不匹配则删除文件。
+    
+    Raises:
+        ValueError: sha256 不匹配
+    """
+    import hashlib
+    digest = hashlib.sha256() if sha256 else None
+    with _http_open(url, timeout=timeout) as response, open(path, 'wb') as f:
+        for chunk in iter(lambda: response.read(64 * 1024), b''):
+            if digest is not None:
+                digest.update(chunk)
+            f.write(chunk)
+    if digest is not None and digest.hexdigest() != sha256.lower():
+        os.remove(path)
+        raise ValueError(f"sha256 mismatch for {url}")
+
+
 # === Termux 包管理 ===
+_TERMUX_FIELD_RE = re.compile(r'^(Package|Filename|SHA256): (\S+)$', re.MULTILINE)
+_TERMUX_INDEX_TTL = 300  # 秒
+_termux_index_lock = threading.Lock()
+
+# Termux 仓库使用的架构名（按 platform.machine() 映射）与当前 Python 版本
+_ARCH = {
+    "aarch64": "aarch64",
+    "armv8l": "aarch64",
+    "armv7l": "arm",
+    "x86_64": "x86_64",
+    "i686": "i686",
+}.get(platform.machine(), platform.machine())
+_PYTHON_VERSION = f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+@lru_cache(maxsize=1)
+def _fetch_termux_index(repo: str, arch: str, ttl_bucket: int) -> Optional[Dict[str, Tuple[str, Optional[str]]]]:
+    """
+    下载并解析 Termux 仓库的 Packages 索引（ttl_bucket 变化时重新下载）。
+    
+    Returns:
+        dict: 仓库中 python-* 包的包名 -> (.deb 相对仓库根的路径, 该文件的 SHA256)，
+              索引未给出 SHA256 时为 None；索引不可用时整体为 None
+    """
+    import http.client
+    import lzma
+    base = f"{repo}/dists/stable/main/binary-{arch}"
+    for name in ("Packages.xz", "Packages"):
+        try:
+            with _http_open(f"{base}/{name}") as response:
+                raw = response.read()
+            if name.endswith(".xz"):
+                raw = lzma.decompress(raw)
+        except (OSError, ValueError, http.client.HTTPException, lzma.LZMAError):
+            continue
+        text = raw.decode('utf-8', errors='replace')
+        index = {}
+        for stanza in text.split('\n\n'):
+            fields = dict(_TERMUX_FIELD_RE.findall(stanza))
+            package = fields.get('Package', '')
+            filename = fields.get('Filename')
+            if package.startswith('python-') and filename:
+                index[package[len('python-'):]] = (filename, fields.get('SHA256'))
+        return index
+    return None
+
+
+def _termux_index() -> Optional[Dict[str, Tuple[str, Optional[str]]]]:
+    """当前配置仓库的包索引（进程内缓存，5 分钟过期）。"""
+    config = _load_config()
+    bucket = int(time.monotonic() // _TERMUX_INDEX_TTL)
+    # lru_cache 挡不住并发未命中：加锁让 install_many 的多个线程只下载一次索引
+    with _termux_index_lock:
+        return _fetch_termux_index(config['termux_repo'], _ARCH, bucket)
+
+
 def _termux_package_exists(package_name: str) -> bool:
     """
     检查包是否存在于 Termux 仓库。
     
+    优先查询缓存的 Packages 索引（一次下载，之后 O(1) 查找），
+    索引不可用时回退为对 .deb 的 HEAD 请求。
+    
     Args:
         package_name (str): 包名（如 "scipy"）
     
     Returns:
         bool: 包是否存在
     """
+    import http.client
+    index = _termux_index()
+    if index is not None:
+        return package_name in index
+    
     config = _load_config()
-    ARCH = "aarch64"  # TODO: 检测实际架构
-    deb_url = f"{config['termux_repo']}/{ARCH}/python-{package_name}_{ARCH}.deb"
+    deb_url = f"{config['termux_repo']}/{_ARCH}/python-{package_name}_{_ARCH}.deb"
     
     try:
-        req = urllib.request.Request(deb_url, method='HEAD')
-        with urllib.request.urlopen(req, timeout=10) as response:
-            return response.getcode() == 200
-    except:
+        with _http_open(deb_url, method='HEAD', timeout=10):
+            return True
+    except (OSError, ValueError, http.client.HTTPException):
         return False
 
 
-def _install_from_termux(package_name: str) -> bool:
+def _install_from_termux(package_name: str) -> Optional[Path]:
     """
-    从 Termux 仓库安装包（忽略版本，只安装最新版）。
+    从 Termux 仓库下载包到全局缓存（忽略版本，只安装最新版）。
     
     Args:
         package_name (str): 包名
     
     Returns:
-        bool: 是否成功
+        Path: 包的缓存目录，失败时为 None
     """
+    import shutil
+    import tarfile
     config = _load_config()
-    ARCH = "aarch64"
-    PYTHON_VERSION = "3.11"  # TODO: 检测实际 Python 版本
     
-    cache_dir = Path(_get_app_files_dir()) / "cache"
+    cache_dir = _cache_dir()
     pkg_cache = cache_dir / package_name
     if pkg_cache.exists():
-        return True
+        return pkg_cache
     
     try:
         print(f"📥 Downloading {package_name} from Termux...")
-        deb_url = f"{config['termux_repo']}/{ARCH}/python-{package_name}_{ARCH}.deb"
+        # 优先使用索引中的 Filename（pool/... 下的实际路径）及其 SHA256
+        entry = (_termux_index() or {}).get(package_name)
+        if entry is not None:
+            filename, sha256 = entry
+            deb_url = f"{config['termux_repo']}/{filename}"
+        else:
+            deb_url = f"{config['termux_repo']}/{_ARCH}/python-{package_name}_{_ARCH}.deb"
+            sha256 = None
         deb_path = cache_dir / f"{package_name}.deb"
         cache_dir.mkdir(parents=True, exist_ok=True)
         
-        urllib.request.urlretrieve(deb_url, deb_path)
-        
-        # 提取 data.tar.xz 从 .deb (ar 格式)
-        data_tar = cache_dir / f"{package_name}_data.tar.xz"
-        with open(deb_path, 'rb') as f:
-            magic = f.read(8)
-            if magic != b'!<arch>\n':
-                raise ValueError("Invalid .deb file format")
-            
-            while True:
-                header = f.read(60)
-                if len(header) < 60:
-                    break
-                
-                # 解析文件名（16字节）
-                fname_bytes = header[:16]
-                fname = fname_bytes.rstrip(b' \x00').decode('utf-8', errors='ignore')
-                size = int(header[48:58].strip())
-                
-                if 'data.tar' in fname:
-                    content = f.read(size)
-                    with open(data_tar, 'wb') as out:
-                        out.write(content)
-                    break
-                
-                # 跳过文件内容和可能的填充字节
-                f.read(size)
-                if size % 2 == 1:
-                    f.read(1)  # ar 格式要求偶数对齐
+        _http_download(deb_url, deb_path, sha256=sha256)
         
-        # 解压 data.tar.xz
+        # 解压 .deb (ar 格式) 中的 data.tar.*，直接流式交给 tarfile，不落地中间文件
         temp_extract = cache_dir / f".tmp_{package_name}"
         temp_extract.mkdir()
         
         try:
-            with tarfile.open(data_tar) as tar:
-                tar.extractall(temp_extract)
+            with open(deb_path, 'rb') as f:
+                magic = f.read(8)
+                if magic != b'!<arch>\n':
+                    raise ValueError("Invalid .deb file format")
+                
+                while True:
+                    header = f.read(60)
+                    if len(header) < 60:
+                        raise FileNotFoundError("data.tar not found in package")
+                    
+                    # 解析文件名（16字节）
+                    fname_bytes = header[:16]
+                    fname = fname_bytes.rstrip(b' \x00').decode('utf-8', errors='ignore')
+                    size = int(header[48:58].strip())
+                    
+                    if 'data.tar' in fname:
+                        member = _LimitedReader(f, size)
+                        with tarfile.open(fileobj=member, mode='r|*') as tar:
+                            tar.extractall(temp_extract)
+                        break
+                    
+                    # 跳过文件内容和可能的填充字节（ar 格式要求偶数对齐）
+                    f.seek(size + (size & 1), os.SEEK_CUR)
             
             # 定位 Python 模块目录
-            src_path = temp_extract / "data/data/com.termux/files/usr/lib" / f"python{PYTHON_VERSION}" / "site-packages"
+            src_path = temp_extract / "data/data/com.termux/files/usr/lib" / f"python{_PYTHON_VERSION}" / "site-packages"
             if not src_path.exists():
                 # 尝试其他可能的 Python 版本
                 lib_dir = temp_extract / "data/data/com.termux/files/usr/lib"
@@ -337,25 +775,118 @@ def _install_from_termux(package_name: str) -> bool:
                 else:
                     raise FileNotFoundError(f"Python site-packages not found in package")
             
-            # 复制到缓存
-            shutil.copytree(src_path, pkg_cache, dirs_exist_ok=True)
+            # 移动到缓存（临时目录就在缓存目录下，同一文件系统内重命名即可）
+            try:
+                os.rename(src_path, pkg_cache)
+            except OSError:
+                if not pkg_cache.exists():  # 并发安装已放好时忽略
+                    raise
             
         finally:
             # 清理临时文件
             if temp_extract.exists():
                 shutil.rmtree(temp_extract)
-            data_tar.unlink(missing_ok=True)
         
         deb_path.unlink(missing_ok=True)
-        return True
+        return pkg_cache
         
     except Exception as e:
         print(f"❌ Termux installation failed: {e}")
-        return False
+        return None
 
 
 # === PyPI 包管理 ===
-def _install_from_pypi(package_name: str, operator: str = "", version: str = "") -> bool:
+# simple 索引页面中的链接（镜像不提供 JSON API 时使用）
+_SIMPLE_ANCHOR_RE = re.compile(r'<a\b([^>]*)>', re.IGNORECASE)
+_SIMPLE_HREF_RE = re.compile(r'href=["\']?([^"\' >]+)', re.IGNORECASE)
+
+
+def _pick_sdist(files: List[Dict], allow_yanked: bool = False) -> Optional[Dict]:
+    """从一个版本的文件列表中选出源码包（.tar.gz 优先，然后 .zip），默认跳过已撤回的文件。"""
+    sdists = [f for f in files
+              if f.get("packagetype") == "sdist" and (allow_yanked or not f.get("yanked"))]
+    for ext in (".tar.gz", ".zip"):
+        for f in sdists:
+            if f.get("filename", "").endswith(ext):
+                return f
+    return None
+
+
+def _select_sdist(meta: Dict, operator: str = "", version: str = "") -> Optional[Dict]:
+    """
+    从 PyPI JSON API 的返回中选出要下载的源码包。
+    
+    == 时使用返回中的 urls（指定版本，按 PEP 592 允许已撤回的文件）；
+    否则优先使用 info.version（PyPI 给出的最新正式版），不满足约束或没有可用
+    源码包时，从 releases 中选满足约束的最新正式版本（跳过预发布版本和已撤回的文件）。
+    
+    Returns:
+        dict: 文件信息（filename, url, digests），找不到时为 None
+    """
+    if operator == "==":
+        return _pick_sdist(meta.get("urls", []), allow_yanked=True)
+    
+    latest = meta.get("info", {}).get("version", "")
+    if latest and (not operator or _version_satisfies(latest, operator, version)):
+        selected = _pick_sdist(meta.get("urls", []))
+        if selected is not None:
+            return selected
+    
+    releases = meta.get("releases", {})
+    candidates = [
+        v for v in releases
+        if _RELEASE_VER_RE.match(v) and (not operator or _version_satisfies(v, operator, version))
+    ]
+    for v in sorted(candidates, key=_normalize_version, reverse=True):
+        selected = _pick_sdist(releases[v])
+        if selected is not None:
+            return selected
+    return None
+
+
+def _select_simple_sdist(page: str, page_url: str, package_name: str,
+                         operator: str = "", version: str = "") -> Optional[Dict]:
+    """
+    从 simple 索引页面（PEP 503）中选出源码包，用于只提供 simple 索引的镜像。
+    
+    跳过已撤回（data-yanked）的链接；除 == 外只考虑正式版本。
+    
+    Returns:
+        dict: 与 _select_sdist 相同格式的文件信息，找不到时为 None
+    """
+    from html import unescape
+    best = None  # ((版本元组, 扩展名优先级), 文件信息)
+    for attrs in _SIMPLE_ANCHOR_RE.findall(page):
+        href = _SIMPLE_HREF_RE.search(attrs)
+        if href is None or (operator != "==" and 'data-yanked' in attrs.lower()):
+            continue
+        url, _, fragment = unescape(href.group(1)).partition('#')
+        filename = unquote(url.rsplit('/', 1)[-1])
+        for rank, ext in enumerate((".tar.gz", ".zip")):
+            if filename.endswith(ext):
+                break
+        else:
+            continue
+        name, sep, ver = filename[:-len(ext)].rpartition('-')
+        if not sep or _DIST_NAME_RE.sub('-', name).lower() != package_name:
+            continue
+        if operator == "==":
+            if ver != version and not _version_satisfies(ver, operator, version):
+                continue
+        elif not _RELEASE_VER_RE.match(ver) or (
+                operator and not _version_satisfies(ver, operator, version)):
+            continue
+        
+        key = (_normalize_version(ver), -rank)
+        if best is None or key > best[0]:
+            digests = {}
+            if fragment.startswith('sha256='):
+                digests['sha256'] = fragment[len('sha256='):]
+            best = (key, {"filename": filename, "url": urljoin(page_url, url), "digests": digests})
+    return best[1] if best is not None else None
+
+
+def _install_from_pypi(package_name: str, operator: str = "", version: str = "") -> Optional[Path]:
     """
     从 PyPI 安装纯 Python 包。
     
@@ -368,50 +899,47 @@ def _install_from_pypi(package_name: str, operator: str = "", version: str = "")
         version (str): 版本号
     
     Returns:
-        bool: 是否成功
+        Path: 包的缓存目录，失败时为 None
     """
+    import shutil
+    import tarfile
+    import zipfile
     config = _load_config()
     
     try:
         print(f"📦 Downloading {package_name} from PyPI...")
-        index_url = config['pypi_index_url'].rstrip('/')
-        package_index = f"{index_url}/{quote(package_name.lower())}/"
-        
-        # 获取包索引页面
-        req = urllib.request.Request(package_index)
-        req.add_header('User-Agent', 'packman/1.0')
-        with urllib.request.urlopen(req, timeout=15) as response:
-            html = response.read().decode('utf-8')
+        # 优先使用 JSON API（/pypi/<name>/json），由 simple 索引地址推出 API 地址
+        simple_url = config['pypi_index_url'].rstrip('/')
+        index_url = simple_url
+        if index_url.endswith('/simple'):
+            index_url = index_url[:-len('/simple')]
+        if operator == "==" and version:
+            json_url = f"{index_url}/pypi/{quote(package_name)}/{quote(version)}/json"
+        else:
+            json_url = f"{index_url}/pypi/{quote(package_name)}/json"
         
-        # 查找源码包链接（.tar.gz 优先，然后 .zip）
-        import re
-        tar_links = re.findall(r'href=[\'"]?([^\'" >]+\.tar\.gz)[\'"]', html)
-        zip_links = re.findall(r'href=[\'"]?([^\'" >]+\.zip)[\'"]', html)
-        all_links = tar_links + zip_links
+        try:
+            with _http_open(json_url) as response:
+                meta = _json_loads(response.read())
+            selected = _select_sdist(meta, operator, version)
+        except _HTTPStatusError as e:
+            if e.status != 404:
+                raise
+            # 镜像没有 JSON API 时回退到 simple 索引
+            page_url = f"{simple_url}/{quote(package_name)}/"
+            with _http_open(page_url) as response:
+                page = response.read().decode('utf-8', errors='replace')
+            selected = _select_simple_sdist(page, page_url, package_name, operator, version)
         
-        if not all_links:
+        if selected is None:
             raise ValueError("No source distributions found")
         
-        # 如果指定了确切版本，优先匹配
-        selected_link = None
-        if operator == "==" and version:
-            version_escaped = re.escape(version)
-            for link in all_links:
-                if re.search(f'{version_escaped}(?:\.post\d+)?\.(?:tar\.gz|zip)', link):
-                    selected_link = link
-                    break
-        
-        # 否则使用第一个链接（通常是最新版）
-        if selected_link is None:
-            selected_link = all_links[0]
-        
-        download_url = urljoin(package_index, selected_link)
-        cache_dir = Path(_get_app_files_dir()) / "cache"
+        cache_dir = _cache_dir()
         cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # 下载包
-        pkg_file = cache_dir / f"{package_name}_source{Path(selected_link).suffix}"
-        urllib.request.urlretrieve(download_url, pkg_file)
+        # 下载包并校验 sha256
+        pkg_file = cache_dir / f"{package_name}_source{Path(selected['filename']).suffix}"
+        _http_download(selected['url'], pkg_file, sha256=selected.get('digests', {}).get('sha256'))
         
         # 解压到缓存目录
         pkg_cache = cache_dir / package_name
@@ -423,21 +951,17 @@ def _install_from_pypi(package_name: str, operator: str = "", version: str = "")
                 if not members:
                     raise ValueError("Empty archive")
                 
-                # 确定根目录名
-                root_dir = members[0].name.split('/')[0]
+                # 去掉根目录前缀后一次性解压（只解压普通文件）
+                root_prefix = members[0].name.split('/')[0] + '/'
+                keep = []
                 for member in members:
-                    if member.name.startswith(root_dir + '/') and len(member.name) > len(root_dir):
-                        # 移除根目录前缀
-                        relative_path = '/'.join(member.name.split('/')[1:])
-                        if relative_path:
-                            target = pkg_cache / relative_path
-                            target.parent.mkdir(parents=True, exist_ok=True)
-                            if member.isfile():
-                                tar.extract(member, pkg_cache)
-                                # 重命名以移除根目录
-                                extracted = pkg_cache / member.name
-                                if extracted.exists():
-                                    shutil.move(str(extracted), str(target))
+                    if not member.isfile() or not member.name.startswith(root_prefix):
+                        continue
+                    relative_path = member.name[len(root_prefix):]
+                    if _is_safe_relative_path(relative_path):
+                        member.name = relative_path
+                        keep.append(member)
+                tar.extractall(pkg_cache, members=keep)
         
         else:  # .zip
             with zipfile.ZipFile(pkg_file) as zf:
@@ -445,22 +969,111 @@ def _install_from_pypi(package_name: str, operator: str = "", version: str = "")
                 if not namelist:
                     raise ValueError("Empty archive")
                 
-                root_dir = namelist[0].split('/')[0]
+                root_prefix = namelist[0].split('/')[0] + '/'
                 for name in namelist:
-                    if name.startswith(root_dir + '/') and len(name) > len(root_dir) + 1:
-                        relative_path = '/'.join(name.split('/')[1:])
-                        target = pkg_cache / relative_path
-                        target.parent.mkdir(parents=True, exist_ok=True)
-                        if not name.endswith('/'):
-                            with zf.open(name) as src, open(target, 'wb') as dst:
-                                dst.write(src.read())
+                    if name.endswith('/') or not name.startswith(root_prefix):
+                        continue
+                    relative_path = name[len(root_prefix):]
+                    if not _is_safe_relative_path(relative_path):
+                        continue
+                    target = pkg_cache / relative_path
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with zf.open(name) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
         
         pkg_file.unlink()
-        return True
+        return pkg_cache
         
     except Exception as e:
         print(f"❌ PyPI installation failed: {e}")
-        return False
+        return None
+
+
+# === 安装流程 ===
+_INSTALL_WORKERS = 4
+
+
+def _fetch_package(pkg_name: str, operator: str, version: str, source: Source) -> Optional[Path]:
+    """
+    下载阶段：按 source 选择安装源，把包下载并解压到全局缓存。
+    
+    只写入该包自己的缓存路径，可在多个线程中并发调用（不同包名）。
+    
+    Returns:
+        Path: 包的缓存目录，失败时为 None
+    """
+    if source == "termux":
+        return _install_from_termux(pkg_name)
+    if source == "pypi":
+        return _install_from_pypi(pkg_name, operator, version)
+    
+    # auto: 先检查 Termux 是否有这个包
+    if _termux_package_exists(pkg_name):
+        print(f"🔍 Found {pkg_name} in Termux repository")
+        pkg_cache = _install_from_termux(pkg_name)
+        if pkg_cache is not None:
+            return pkg_cache
+        print(f"🔍 Termux install of {pkg_name} failed, using PyPI")
+    else:
+        print(f"🔍 {pkg_name} not in Termux, using PyPI")
+    return _install_from_pypi(pkg_name, operator, version)
+
+
+def _cached_version(pkg_cache: Path) -> Optional[str]:
+    """
+    读取缓存中包的版本号（源码包的 PKG-INFO 或 *.dist-info/METADATA 中的 Version 字段）。
+    
+    Returns:
+        str: 版本号，找不到时为 None
+    """
+    for path in (pkg_cache / "PKG-INFO", *pkg_cache.glob("*.dist-info/METADATA")):
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.startswith(b'Version:'):
+                        return line[len(b'Version:'):].strip().decode('utf-8', errors='replace')
+                    if not line.strip():  # 头部结束
+                        break
+        except OSError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=8)
+def _site_distributions(site_dir: str, mtime_ns: int) -> Dict[str, str]:
+    """
+    读取 site-packages 中的 dist-info 元数据（mtime_ns 仅作缓存键，目录变化后重新扫描）。
+    
+    Returns:
+        dict: 规范化包名 -> 版本号
+    """
+    from importlib.metadata import distributions
+    versions = {}
+    for dist in distributions(path=[site_dir]):
+        name = dist.metadata['Name']
+        if name:
+            versions.setdefault(_DIST_NAME_RE.sub('-', name).lower(), dist.version)
+    return versions
+
+
+def _link_package(pkg_cache: Path, project_name: Optional[str] = None) -> None:
+    """把缓存中的包链接到项目 site-packages（符号链接失败时复制）。"""
+    site_dir = get_project_site_packages(project_name)
+    with os.scandir(pkg_cache) as it:
+        for entry in it:
+            link_path = os.path.join(site_dir, entry.name)
+            is_dir = entry.is_dir()
+            try:
+                os.symlink(entry.path, link_path, target_is_directory=is_dir)
+            except FileExistsError:
+                pass
+            except OSError:
+                # 如果符号链接失败，复制文件（兼容性）
+                import shutil
+                if is_dir:
+                    shutil.copytree(entry.path, link_path)
+                else:
+                    shutil.copy2(entry.path, link_path)
 
 
 # === 公共 API ===
@@ -491,7 +1104,7 @@ def get_cache_dir() -> str:
     Returns:
         str: 缓存目录路径
     """
-    return str(Path(_get_app_files_dir()) / "cache")
+    return str(_cache_dir())
 
 
 def get_project_site_packages(project_name: Optional[str] = None) -> str:
@@ -538,11 +1151,17 @@ def is_installed(requirement: str, project_name: Optional[str] = None) -> bool:
     """
     try:
         pkg_name, op, ver = _parse_requirement(requirement)
-        site_dir = Path(get_project_site_packages(project_name))
+        site_dir = get_project_site_packages(project_name)
+        
+        # 优先读取 dist-info 元数据，不执行包代码
+        versions = _site_distributions(site_dir, os.stat(site_dir).st_mtime_ns)
+        installed_ver = versions.get(pkg_name)
+        if installed_ver is not None:
+            return _version_satisfies(installed_ver, op, ver)
         
-        # 临时添加到 sys.path 进行检查
+        # 没有 dist-info（如只带包目录的 Termux 包）时，临时添加到 sys.path 导入检查
         original_path = sys.path[:]
-        sys.path.insert(0, str(site_dir))
+        sys.path.insert(0, site_dir)
         try:
             mod = __import__(pkg_name)
             installed_ver = getattr(mod, '__version__', '0.0.0')
@@ -587,41 +1206,78 @@ def install(
         print(f"✅ {requirement} already satisfied")
         return True
     
-    success = False
-    
-    if source == "termux":
-        success = _install_from_termux(pkg_name)
-    elif source == "pypi":
-        success = _install_from_pypi(pkg_name, op, ver)
-    else:  # auto
-        # 先检查 Termux 是否有这个包
-        if _termux_package_exists(pkg_name):
-            print(f"🔍 Found {pkg_name} in Termux repository")
-            success = _install_from_termux(pkg_name)
-        else:
-            print(f"🔍 {pkg_name} not in Termux, using PyPI")
-            success = _install_from_pypi(pkg_name, op, ver)
-    
-    if not success:
+    pkg_cache = _fetch_package(pkg_name, op, ver, source)
+    if pkg_cache is None:
         print(f"❌ Failed to install {requirement}")
         return False
     
     # 创建符号链接到项目目录
-    cache_dir = Path(get_cache_dir())
-    pkg_cache = cache_dir / pkg_name
-    if pkg_cache.exists():
-        site_dir = Path(get_project_site_packages(project_name))
-        for item in pkg_cache.iterdir():
-            link_path = site_dir / item.name
-            if not link_path.exists():
-                try:
-                    link_path.symlink_to(item, target_is_directory=item.is_dir())
-                except OSError:
-                    # 如果符号链接失败，复制文件（兼容性）
-                    if item.is_dir():
-                        shutil.copytree(item, link_path)
-                    else:
-                        shutil.copy2(item, link_path)
+    _link_package(pkg_cache, project_name)
     
     print(f"✅ Successfully installed {requirement}")
-    return True
\ No newline at end of file
+    return True
+
+
+def install_many(
+    requirements: List[str],
+    project_name: Optional[str] = None,
+    source: Source = "auto"
+) -> Dict[str, bool]:
+    """
+    批量安装多个包：并发下载，之后依次链接到项目目录。
+    
+    Args:
+        requirements (list): 包需求列表，如 ["requests", "scipy==1.10.0"]
+        project_name (str, optional): 项目名称，默认当前项目
+        source (str): 安装源，同 install()
+    
+    Returns:
+        dict: 每个需求字符串对应是否成功安装
+    
+    Examples:
+        install_many(["requests", "numpy>=1.20"])
+    """
+    results = {}
+    pending = {}  # requirement -> 包名
+    fetches = {}  # 包名 -> (operator, version)，同名包只下载一次
+    for requirement in requirements:
+        if requirement in results or requirement in pending:
+            continue
+        # is_installed 会临时修改 sys.path，只在主线程中依次检查
+        if is_installed(requirement, project_name):
+            print(f"✅ {requirement} already satisfied")
+            results[requirement] = True
+            continue
+        pkg_name, op, ver = _parse_requirement(requirement)
+        pending[requirement] = pkg_name
+        fetches.setdefault(pkg_name, (op, ver))
+    
+    if fetches:
+        from concurrent.futures import ThreadPoolExecutor
+        workers = min(_INSTALL_WORKERS, len(fetches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                pkg_name: executor.submit(_fetch_package, pkg_name, op, ver, source)
+                for pkg_name, (op, ver) in fetches.items()
+            }
+        
+        # 所有下载完成后再串行创建链接
+        for requirement, pkg_name in pending.items():
+            pkg_cache = futures[pkg_name].result()
+            if pkg_cache is None:
+                print(f"❌ Failed to install {requirement}")
+                results[requirement] = False
+                continue
+            _link_package(pkg_cache, project_name)
+            op, ver = _parse_requirement(requirement)[1:]
+            if op and (op, ver) != fetches[pkg_name]:
+                # 同名包只按第一个约束下载，其余约束要对照实际下载到的版本
+                fetched = _cached_version(pkg_cache)
+                if fetched is None or not _version_satisfies(fetched, op, ver):
+                    print(f"❌ {requirement} not satisfied by fetched {pkg_name} {fetched or '(unknown version)'}")
+                    results[requirement] = False
+                    continue
+            print(f"✅ Successfully installed {requirement}")
+            results[requirement] = True
+    
+    return {requirement: results[requirement] for requirement in requirements}
@@ -4,28 +4,18 @@ if platform == 'android':
     from kivy.logger import Logger
     from jnius import autoclass
     import os
-    import json
-    import hashlib
-    from pathlib import Path
 
     # 获取当前服务类名（如 ServiceSlot3）
     SERVICE_NAME = os.environ.get("PYTHON_SERVICE_NAME", "UnknownService")
     SLOT_INDEX = int(SERVICE_NAME.replace("ServiceSlot", ""))
 
-    # 读取 service.json，找到自己负责的项目
+    # 读取服务槽位分配表（service.json + service.log），找到自己负责的项目
     def get_assigned_project():
-        from packman import _get_app_files_dir
-        service_json = Path(_get_app_files_dir()) / "service.json"
-        if not service_json.exists():
-            return None
+        from packman import get_service_assignment
         try:
-            with open(service_json, "r") as f:
-                data = json.load(f)
-            for proj_id, info in data.items():
-                if info.get("slot") == SLOT_INDEX:
-                    return info
+            return get_service_assignment(SLOT_INDEX)
         except Exception as e:
-            Logger.error(f"Failed to read service.json: {e}")
+            Logger.error(f"Failed to read service assignments: {e}")
         return None
 
     def start(context, args="{}"):